@@ -29,6 +29,16 @@ FPS = 30
 MODEL_PATH = "yolo26n.pt"  # Will be downloaded automatically by ultralytics
 CONFIDENCE_THRESHOLD = 0.5
 DETECTION_INTERVAL = 30  # Run detection every N frames to save resources
+# "fp16" runs inference in half precision (CUDA only, ignored on CPU), "fp32" for full precision.
+# For TensorRT, export once with YOLO(MODEL_PATH).export(format="engine", half=True)
+# and point MODEL_PATH at the resulting .engine file.
+DETECTOR_PRECISION = "fp16"
+
+# Thread pools. The detector gets the cores; encoding and drawing stay single-threaded
+BLAS_THREADS = 2  # OMP/MKL, only applied if not already set in the environment
+OPENCV_THREADS = 1
+# Every core except those kept for capture/encoding and the web server; TORCH_THREADS env var overrides
+TORCH_THREADS = int(os.getenv("TORCH_THREADS", "0")) or max(1, (os.cpu_count() or 1) - OPENCV_THREADS - 1)
 
 # Audio Settings
 TTS_RATE = 150  # Words per minute
@@ -45,6 +55,7 @@ GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
 SECRET_KEY = os.getenv("SECRET_KEY", "super-secret-default-key-for-dev") # For Starlette Session
+REDIS_URL = os.getenv("REDIS_URL") # e.g. redis://localhost:6379/0 to keep sessions in Redis instead of cookies
 
 LLM_COOLDOWN = 15.0 # Seconds between LLM calls to avoid Rate Limits (Free Tier)
 
@@ -18,12 +18,18 @@ class AudioFeedback:
         with self.q.mutex:
             self.q.queue.clear()
 
-    def speak(self, text):
-        if self.muted: return
+    def speak(self, text, force=False):
+        """
+        Queues text for speech and returns True if it was queued.
+        force skips the backlog limit, for the rest of a response that is already being spoken.
+        """
+        if self.muted: return False
         # We assume if new text comes, it's relevant.
         # Check if queue already has similar item?
-        if self.q.qsize() < 2: # Don't build up a huge backlog
+        if force or self.q.qsize() < 2: # Don't build up a huge backlog
             self.q.put(text)
+            return True
+        return False
 
     def worker(self):
         print("Audio Worker Started (PowerShell TTS)")
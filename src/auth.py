@@ -1,27 +1,82 @@
 from fastapi import APIRouter, Depends, Request, HTTPException
 from fastapi.responses import RedirectResponse, HTMLResponse
 from fastapi.templating import Jinja2Templates
-from authlib.integrations.starlette_client import OAuth
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
 import hashlib
+import hmac
 import secrets
+import threading
+from cachetools import TTLCache
 import config
-from src.database import get_db, User
+from src.database import get_db_read, get_db_write, User
 
 auth_router = APIRouter()
 templates = Jinja2Templates(directory="src/templates")
 
+# hashlib.pbkdf2_hmac is backed by OpenSSL, which picks its SHA-NI / AVX2 SHA-256
+# kernels at runtime, so the stdlib call already uses the hardware path.
+# Hashes are stored as "<algo>$<salt>$<hash>"; untagged "<salt>$<hash>" values
+# from before the tag was introduced are still accepted as pbkdf2_sha256.
+PASSWORD_HASH_ALGO = "pbkdf2_sha256"
+PBKDF2_ITERATIONS = 100000
+
+def _pbkdf2_sha256(password: str, salt: str) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), PBKDF2_ITERATIONS)
+
 def hash_password(password: str) -> str:
     salt = secrets.token_hex(8)
-    pw_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
-    return f"{salt}${pw_hash}"
+    pw_hash = _pbkdf2_sha256(password, salt).hex()
+    return f"{PASSWORD_HASH_ALGO}${salt}${pw_hash}"
 
 def verify_password(password: str, hashed: str) -> bool:
     if not hashed or '$' not in hashed: return False
-    salt, pw_hash = hashed.split('$')
-    expected_hash = hashlib.pbkdf2_hmac('sha256', password.encode('utf-8'), salt.encode('utf-8'), 100000).hex()
-    return expected_hash == pw_hash
+    parts = hashed.split('$')
+    if len(parts) == 2:
+        algo, (salt, pw_hash) = PASSWORD_HASH_ALGO, parts
+    elif len(parts) == 3:
+        algo, salt, pw_hash = parts
+    else:
+        return False
+    if algo != PASSWORD_HASH_ALGO:
+        return False
+    try:
+        stored_hash = bytes.fromhex(pw_hash)
+    except ValueError:
+        return False
+    # Constant-time compare on the raw digests to avoid a timing oracle
+    return hmac.compare_digest(_pbkdf2_sha256(password, salt), stored_hash)
+
+# Serialized /api/user/me payloads keyed by user id. User rows change rarely, so
+# a short TTL keeps most authenticated requests off the database.
+_user_cache = TTLCache(maxsize=4096, ttl=30)
+_user_cache_lock = threading.Lock()
+
+def get_user_profile(db: Session, user_id: int):
+    """Returns the cached profile dict for user_id, loading it on a miss."""
+    with _user_cache_lock:
+        profile = _user_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        return None
+    profile = {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "avatar_url": user.avatar_url,
+        "settings_json": user.settings_json
+    }
+    with _user_cache_lock:
+        _user_cache[user_id] = profile
+    return profile
+
+def invalidate_user_profile(user_id: int):
+    with _user_cache_lock:
+        _user_cache.pop(user_id, None)
 
 class LoginRequest(BaseModel):
     email: str
@@ -32,22 +87,27 @@ class SignupRequest(BaseModel):
     email: str
     password: str
 
+async def require_user(request: Request) -> int:
+    """Dependency returning the logged-in user's id, or raising 401."""
+    user_id = request.session.get('user_id')
+    if not user_id:
+        raise HTTPException(status_code=401, detail="Not logged in")
+    return user_id
+
 @auth_router.get('/login', response_class=HTMLResponse)
 async def login_page(request: Request):
     if request.session.get('user_id'):
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/", status_code=303)
     return templates.TemplateResponse("login.html", {"request": request})
 
 @auth_router.get('/signup', response_class=HTMLResponse)
 async def signup_page(request: Request):
     if request.session.get('user_id'):
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/", status_code=303)
     return templates.TemplateResponse("signup.html", {"request": request})
 
 @auth_router.post('/auth/signup')
-async def signup(req: SignupRequest, request: Request, db: Session = Depends(get_db)):
+def signup(req: SignupRequest, request: Request, db: Session = Depends(get_db_write)):
     # Check if user exists
     user = db.query(User).filter(User.email == req.email).first()
     if user:
@@ -61,13 +121,14 @@ async def signup(req: SignupRequest, request: Request, db: Session = Depends(get
     db.add(new_user)
     db.commit()
     db.refresh(new_user)
+    invalidate_user_profile(new_user.id)
     
     # Auto loop login
     request.session['user_id'] = new_user.id
     return {"status": "success"}
 
 @auth_router.post('/auth/login')
-async def login_local(req: LoginRequest, request: Request, db: Session = Depends(get_db)):
+def login_local(req: LoginRequest, request: Request, db: Session = Depends(get_db_read)):
     user = db.query(User).filter(User.email == req.email).first()
     if not user:
         raise HTTPException(status_code=401, detail="Invalid email or password.")
@@ -79,30 +140,41 @@ async def login_local(req: LoginRequest, request: Request, db: Session = Depends
         raise HTTPException(status_code=401, detail="Invalid email or password.")
         
     request.session['user_id'] = user.id
+    # Start each login from a fresh profile
+    invalidate_user_profile(user.id)
     return {"status": "success"}
 
-oauth = OAuth()
-oauth.register(
-    name='google',
-    client_id=config.GOOGLE_CLIENT_ID,
-    client_secret=config.GOOGLE_CLIENT_SECRET,
-    server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
-    client_kwargs={
-        'scope': 'openid email profile'
-    }
-)
+_oauth = None
+
+def _google():
+    """Returns the Google OAuth client, importing authlib and registering it on first use."""
+    global _oauth
+    if _oauth is None:
+        from authlib.integrations.starlette_client import OAuth
+        oauth = OAuth()
+        oauth.register(
+            name='google',
+            client_id=config.GOOGLE_CLIENT_ID,
+            client_secret=config.GOOGLE_CLIENT_SECRET,
+            server_metadata_url='https://accounts.google.com/.well-known/openid-configuration',
+            client_kwargs={
+                'scope': 'openid email profile'
+            }
+        )
+        _oauth = oauth
+    return _oauth.google
 
 @auth_router.get('/auth/google')
 async def login_google(request: Request):
     if not config.GOOGLE_CLIENT_ID or not config.GOOGLE_CLIENT_SECRET:
         return {"error": "Google Auth is not configured in .env"}
     redirect_uri = request.url_for('auth_callback')
-    return await oauth.google.authorize_redirect(request, redirect_uri)
+    return await _google().authorize_redirect(request, redirect_uri)
 
 @auth_router.get('/auth/callback')
-async def auth_callback(request: Request, db: Session = Depends(get_db)):
+async def auth_callback(request: Request, db: Session = Depends(get_db_write)):
     try:
-        token = await oauth.google.authorize_access_token(request)
+        token = await _google().authorize_access_token(request)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
         
@@ -115,21 +187,26 @@ async def auth_callback(request: Request, db: Session = Depends(get_db)):
     google_id = user_info.get('sub')
     picture = user_info.get('picture')
 
-    # Find or create user
-    user = db.query(User).filter(User.google_id == google_id).first()
-    if not user:
-        user = User(
-            google_id=google_id,
-            email=email,
-            name=name,
-            avatar_url=picture
-        )
-        db.add(user)
-        db.commit()
-        db.refresh(user)
+    # Find or create user (sync session, so off the event loop)
+    def find_or_create_user():
+        user = db.query(User).filter(User.google_id == google_id).first()
+        if not user:
+            user = User(
+                google_id=google_id,
+                email=email,
+                name=name,
+                avatar_url=picture
+            )
+            db.add(user)
+            db.commit()
+            db.refresh(user)
+        invalidate_user_profile(user.id)
+        return user.id
+
+    user_id = await run_in_threadpool(find_or_create_user)
     
     # Store user id in session
-    request.session['user_id'] = user.id
+    request.session['user_id'] = user_id
     
     # Redirect back to frontend
     return RedirectResponse(url="/")
@@ -140,19 +217,9 @@ async def logout(request: Request):
     return RedirectResponse(url="/")
 
 @auth_router.get("/api/user/me")
-async def get_current_user(request: Request, db: Session = Depends(get_db)):
-    user_id = request.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
-        
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+def get_current_user(user_id: int = Depends(require_user), db: Session = Depends(get_db_read)):
+    profile = get_user_profile(db, user_id)
+    if not profile:
         raise HTTPException(status_code=401, detail="User not found")
         
-    return {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "avatar_url": user.avatar_url,
-        "settings_json": user.settings_json
-    }
+    return profile
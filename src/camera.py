@@ -20,6 +20,8 @@ class CameraFeed:
         
         self.stopped = False
         self.lock = threading.Lock()
+        # Set whenever a new frame has been grabbed; consumers wait on it instead of polling
+        self.frame_available = threading.Event()
 
     def start(self):
         t = threading.Thread(target=self.update, args=())
@@ -36,12 +38,23 @@ class CameraFeed:
             with self.lock:
                 self.grabbed = grabbed
                 self.frame = frame
+            if grabbed:
+                self.frame_available.set()
             time.sleep(0.01) # Small sleep to prevent tight loop burning CPU
 
     def read(self):
         with self.lock:
             return self.frame.copy() if self.frame is not None else None
 
+    def latest(self):
+        """
+        Returns the latest frame without copying it. update() replaces the frame
+        with a fresh array on every grab and never writes into it, so the result
+        stays valid; treat it as read-only.
+        """
+        with self.lock:
+            return self.frame
+
     def stop(self):
         self.stopped = True
         self.stream.release()
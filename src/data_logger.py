@@ -2,6 +2,35 @@ import json
 import datetime
 import time
 import threading
+import collections
+import atexit
+import logging
+
+# Most recent events, newest last, so readers never need to touch the file
+RECENT_MAX = 200
+_recent = collections.deque(maxlen=RECENT_MAX)
+_recent_lock = threading.Lock()
+
+def seed_recent_events(events):
+    """Puts older events (e.g. read back from the log file) ahead of anything already recorded."""
+    with _recent_lock:
+        merged = list(events) + list(_recent)
+        _recent.clear()
+        _recent.extend(merged)
+
+def recent_events(n=20):
+    """Returns a snapshot of the last n logged events."""
+    with _recent_lock:
+        return list(_recent)[-n:]
+
+def _remember(event_data: dict):
+    with _recent_lock:
+        _recent.append(event_data)
+
+def _ensure_timestamp(event_data: dict):
+    if "timestamp" not in event_data:
+        # Use local time with timezone information
+        event_data["timestamp"] = datetime.datetime.now().astimezone().isoformat(timespec='seconds')
 
 class DataLogger:
     def __init__(self, filepath="detections.jsonl"):
@@ -12,12 +41,62 @@ class DataLogger:
         """
         Thread-safe appending of event data to JSONL file.
         """
-        # Ensure timestamp exists
-        if "timestamp" not in event_data:
-            # Use local time with timezone information
-            event_data["timestamp"] = datetime.datetime.now().astimezone().isoformat(timespec='seconds')
+        self.log_many([event_data])
+        _remember(event_data)
+
+    def log_many(self, events):
+        """
+        Appends several events with a single open/write.
+        """
+        if not events:
+            return
+        for event_data in events:
+            # Ensure timestamp exists
+            _ensure_timestamp(event_data)
 
         with self.lock:
             with open(self.filepath, "a", encoding="utf-8") as f:
-                json_line = json.dumps(event_data)
-                f.write(json_line + "\n")
+                f.write("".join(json.dumps(event_data) + "\n" for event_data in events))
+
+class BatchingLogger:
+    """
+    Wraps a DataLogger so callers only append to an in-memory queue.
+    A background thread writes the queued events every `interval` seconds,
+    or sooner once `max_batch` events are waiting.
+    """
+    def __init__(self, inner: DataLogger, interval=0.2, max_batch=64):
+        self.inner = inner
+        self.interval = interval
+        self.max_batch = max_batch
+        self.q = collections.deque()
+        self._wake = threading.Event()
+
+        t = threading.Thread(target=self._worker, daemon=True)
+        t.start()
+        atexit.register(self.flush)
+
+    def log(self, event_data: dict):
+        # Stamp now rather than at flush time
+        _ensure_timestamp(event_data)
+        _remember(event_data)
+        self.q.append(event_data)
+        if len(self.q) >= self.max_batch:
+            self._wake.set()
+
+    def flush(self):
+        batch = []
+        try:
+            while True:
+                batch.append(self.q.popleft())
+        except IndexError:
+            pass
+        self.inner.log_many(batch)
+
+    def _worker(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logging.error(f"DataLogger flush failed: {e}")
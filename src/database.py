@@ -1,20 +1,68 @@
-from sqlalchemy import create_engine, Column, Integer, String, Text, ForeignKey
+from sqlalchemy import create_engine, event, text, Column, Integer, String, LargeBinary, ForeignKey
 from sqlalchemy.orm import declarative_base, sessionmaker, relationship
-from sqlalchemy.pool import StaticPool
-import json
+from sqlalchemy.pool import QueuePool
+from sqlalchemy.types import TypeDecorator
+import orjson
 import os
 
 DATABASE_URL = "sqlite:///./assistive_vision.db"
+READ_DATABASE_URL = "sqlite:///file:./assistive_vision.db?mode=ro&uri=true"
 
 # ConnectArgs needed for SQLite to allow multi-thread access in FastAPI
+# SQLite only ever has one writer, so the write pool is kept to a single
+# connection (plus a little overflow so a request still holding a session
+# can't starve checkout). Reads go through a separate read-only pool.
 engine = create_engine(
     DATABASE_URL, 
     connect_args={"check_same_thread": False},
-    poolclass=StaticPool
+    poolclass=QueuePool,
+    pool_size=1,
+    max_overflow=2
 )
+read_engine = create_engine(
+    READ_DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    poolclass=QueuePool,
+    pool_size=8,
+    max_overflow=4
+)
+
+def _apply_pragmas(dbapi_conn, pragmas):
+    cursor = dbapi_conn.cursor()
+    for pragma in pragmas:
+        cursor.execute(f"PRAGMA {pragma}")
+    cursor.close()
+
+_SHARED_PRAGMAS = (
+    "temp_store=MEMORY",
+    "cache_size=-64000",  # 64MB page cache
+    "mmap_size=268435456",  # 256MB
+)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_conn, connection_record):
+    # WAL lets readers proceed while a writer commits; NORMAL sync is safe under WAL
+    _apply_pragmas(dbapi_conn, ("journal_mode=WAL", "synchronous=NORMAL") + _SHARED_PRAGMAS)
+
+@event.listens_for(read_engine, "connect")
+def _set_sqlite_read_pragmas(dbapi_conn, connection_record):
+    _apply_pragmas(dbapi_conn, ("query_only=1",) + _SHARED_PRAGMAS)
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 Base = declarative_base()
 
+class OrjsonType(TypeDecorator):
+    """JSON value stored as orjson bytes and handed back already decoded."""
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return orjson.dumps(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return orjson.loads(value) if value is not None else None
+
 class User(Base):
     __tablename__ = "users"
 
@@ -25,8 +73,8 @@ class User(Base):
     avatar_url = Column(String, nullable=True)
     hashed_password = Column(String, nullable=True)
     
-    # Store user-specific settings as a JSON string
-    settings_json = Column(Text, default=json.dumps({"show_overlays": True}))
+    # User-specific settings as a dict, stored as orjson bytes
+    settings_json = Column(OrjsonType, default=lambda: {"show_overlays": True})
 
     faces = relationship("ReferenceFace", back_populates="owner", cascade="all, delete-orphan")
 
@@ -42,12 +90,22 @@ class ReferenceFace(Base):
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # settings_json used to be stored as TEXT; convert old rows to BLOB
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE users SET settings_json = CAST(settings_json AS BLOB) WHERE typeof(settings_json) = 'text'"))
     # Ensure user-specific face directories exist
     os.makedirs("src/faces", exist_ok=True)
 
-def get_db():
+def get_db_write():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+def get_db_read():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
@@ -1,9 +1,17 @@
+import numpy as np
+import torch
 from ultralytics import YOLO
 import config
 
 class ObjectDetector:
-    def __init__(self, model_path=config.MODEL_PATH):
+    def __init__(self, model_path=config.MODEL_PATH, precision=config.DETECTOR_PRECISION):
+        torch.set_num_threads(config.TORCH_THREADS)
         self.model = YOLO(model_path)
+        self.half = precision == "fp16"
+
+    def warmup(self, size=640):
+        """Runs one inference on a blank frame so weights and kernels are ready before real frames arrive."""
+        self.detect(np.zeros((size, size, 3), dtype=np.uint8))
     
     def detect(self, frame):
         """
@@ -22,7 +30,7 @@ class ObjectDetector:
         frame_area = width * height
         
         # stream=True for efficiency
-        results = self.model.predict(frame, conf=config.CONFIDENCE_THRESHOLD, verbose=False)
+        results = self.model.predict(frame, conf=config.CONFIDENCE_THRESHOLD, half=self.half, verbose=False)
         
         detections = []
         for result in results:
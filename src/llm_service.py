@@ -1,32 +1,141 @@
-import json
+import orjson
+import re
 import time
+import hashlib
 import logging
 import threading
+import queue
+import collections
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 import io
 import os
 import cv2
 import numpy as np
 from PIL import Image
+from cachetools import TTLCache
 import config
 import logging
 import threading
 import config
-from src.data_logger import DataLogger
+from src.data_logger import DataLogger, BatchingLogger
 from src.vector_store import VectorStore
 try:
     from google import genai
+    from google.genai import types
 except ImportError:
     genai = None
+    types = None
+
+# Prompt pieces for generate_response, built once at import. The language-specific
+# tail is formatted on first use per language and reused afterwards.
+_PROMPT_INTRO = (
+    "You are an assistive vision assistant for a visually impaired user. "
+    "I will provide an image of what is in front of the user, and a list of objects detected by sensors.\\n"
+)
+_PROMPT_FACES = "I've also provided reference images of known people. Compare any faces in the main image to these references. If you recognize them, refer to them by name. Explicitly describe their emotion or expressions.\\n"
+_PROMPT_HEAD = _PROMPT_INTRO + "Sensor Detections:\\n"
+_PROMPT_HEAD_WITH_FACES = _PROMPT_INTRO + _PROMPT_FACES + "Sensor Detections:\\n"
+_PROMPT_TAIL_TEMPLATE = (
+    "\\n\\n"
+    "Task: Analyze the main image and the detections. Provide a helpful, safety-focused spoken notification in {lang}. "
+    "If there is text in the image, read it if relevant. Describe important details that sensors might miss. "
+    "Strictly follow this format: 'There is [description]. [Navigational guidance]'. "
+    "Keep it concise, under 2 sentences. Prioritize immediate safety hazards."
+)
+_prompt_tail_cache = {}
+
+def _prompt_tail(target_language):
+    tail = _prompt_tail_cache.get(target_language)
+    if tail is None:
+        tail = _PROMPT_TAIL_TEMPLATE.format(lang=target_language)
+        _prompt_tail_cache[target_language] = tail
+    return tail
+
+# Splits streamed text after sentence-ending punctuation
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def _shrink(img, max_side=768):
+    """Downscales a frame so its long edge is at most max_side pixels."""
+    h, w = img.shape[:2]
+    scale = max_side / max(h, w)
+    if scale >= 1:
+        return img
+    return cv2.resize(img, (int(w * scale), int(h * scale)), interpolation=cv2.INTER_AREA)
+
+# Reference faces are pre-encoded to a 384px JPEG stored next to the original
+# ("<file>.384.jpg"). Each user's loaded faces (name + JPEG bytes) are kept in
+# RAM, so frames with a person touch neither the database nor the disk.
+# Upload/delete evict the user's entry; the TTL picks up changes made outside the app.
+_face_cache = TTLCache(maxsize=256, ttl=300)
+_face_cache_lock = threading.Lock()
+
+def reference_jpeg_path(path):
+    return path + ".384.jpg"
+
+def encode_reference_face(path):
+    """Writes the pre-resized JPEG for a reference face and returns its bytes."""
+    with Image.open(path) as img:
+        img = img.convert("RGB")
+        img.thumbnail((384, 384), Image.BILINEAR)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=85)
+    data = buf.getvalue()
+    with open(reference_jpeg_path(path), "wb") as f:
+        f.write(data)
+    return data
+
+def _load_reference_face(path):
+    jpeg_path = reference_jpeg_path(path)
+    if os.path.exists(jpeg_path) and os.path.getmtime(jpeg_path) >= os.path.getmtime(path):
+        with open(jpeg_path, "rb") as f:
+            return f.read()
+    return encode_reference_face(path)
+
+def _get_reference_faces(user_id):
+    """Returns [{"name", "data"}] for a user's reference faces (treat as read-only)."""
+    with _face_cache_lock:
+        user_faces = _face_cache.get(user_id)
+    if user_faces is not None:
+        return user_faces
+
+    from src.database import ReadSessionLocal, ReferenceFace
+    db = ReadSessionLocal()
+    try:
+        faces = db.query(ReferenceFace).filter(ReferenceFace.user_id == user_id).all()
+        face_list = [(face.name, face.file_path) for face in faces]
+    finally:
+        db.close()
+
+    user_faces = []
+    for name, file_path in face_list:
+        if os.path.exists(file_path):
+            try:
+                user_faces.append({"name": name, "data": _load_reference_face(file_path)})
+            except Exception as e:
+                logging.error(f"Failed to load user face {file_path}: {e}")
+    with _face_cache_lock:
+        _face_cache[user_id] = user_faces
+    return user_faces
+
+def evict_reference_faces(user_id):
+    """Drops cached reference faces for a user after an upload or delete."""
+    with _face_cache_lock:
+        _face_cache.pop(user_id, None)
 
 class LLMService:
     def __init__(self):
         self.session_data = {
-            "objects_seen": {},
+            "objects_seen": collections.Counter(),
             "dangerous_events": 0,
             "start_time": time.time()
         }
-        self.logger = DataLogger()
+        self.logger = BatchingLogger(DataLogger()) # Keeps disk writes off the frame path
         self.logged_objects = {} # Stores time of last log per label
+        # Gemini answers keyed by a hash of everything sent, so identical
+        # prompts within the TTL skip the network round-trip
+        self._response_cache = TTLCache(maxsize=256, ttl=60)
+        self._response_cache_lock = threading.Lock()
         
         # Configure Gemini (New SDK)
         self.client = None
@@ -45,9 +154,63 @@ class LLMService:
 
 
 
+        # Bounded pool for blocking work (VectorStore init, Gemini calls from async routes)
+        self._pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="llm")
+
         # Initialize VectorStore in background to not block startup if slow
         self.vector_store = None
-        threading.Thread(target=self._init_vector_store, daemon=True).start()
+        self._pool.submit(self._init_vector_store)
+
+        # Embeddings are queued and written in batches by a single worker
+        self._embed_q = queue.Queue(maxsize=10_000)
+        threading.Thread(target=self._embed_worker, daemon=True).start()
+
+    def _generate_cached(self, contents, key_parts, on_text=None):
+        """
+        Calls Gemini unless a response for the same key_parts is cached.
+        If on_text is given the response is streamed and each complete sentence
+        is passed to it as soon as it arrives.
+        """
+        digest = hashlib.blake2b(self.model_name.encode("utf-8"), digest_size=16)
+        for part in key_parts:
+            digest.update(part)
+        key = digest.hexdigest()
+
+        with self._response_cache_lock:
+            cached = self._response_cache.get(key)
+        if cached is not None:
+            if on_text:
+                on_text(cached)
+            return cached
+
+        if on_text:
+            text = self._stream_generate(contents, on_text)
+        else:
+            response = self.client.models.generate_content(
+                model=self.model_name,
+                contents=contents
+            )
+            text = response.text
+        if text:
+            with self._response_cache_lock:
+                self._response_cache[key] = text
+        return text
+
+    def _stream_generate(self, contents, on_text):
+        parts = []
+        pending = ""
+        for chunk in self.client.models.generate_content_stream(model=self.model_name, contents=contents):
+            if not chunk.text:
+                continue
+            parts.append(chunk.text)
+            pending += chunk.text
+            sentences = _SENTENCE_END.split(pending)
+            pending = sentences.pop()
+            for sentence in sentences:
+                on_text(sentence)
+        if pending.strip():
+            on_text(pending.strip())
+        return "".join(parts)
 
     def _init_vector_store(self):
         try:
@@ -56,23 +219,39 @@ class LLMService:
         except Exception as e:
             logging.error(f"VectorStore init failed: {e}")
 
-    def generate_response(self, metadata_json, image_data=None, target_language=config.TARGET_LANGUAGE, user_id=None):
+    def _embed_worker(self, batch_size=32, max_wait=0.05):
+        while True:
+            batch = [self._embed_q.get()]
+            deadline = time.time() + max_wait
+            while len(batch) < batch_size:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._embed_q.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            if self.vector_store:
+                self.vector_store.add_many([d for d, _ in batch], [m for _, m in batch])
+
+    def generate_response(self, metadata_json, image_data=None, target_language=config.TARGET_LANGUAGE, user_id=None, on_text=None):
         """
         Generates a spoken response from the LLM based on metadata and optional image using Google Gemini.
+        If on_text is given, sentences are streamed to it while the response is generated.
         """
-        data = json.loads(metadata_json)
+        data = orjson.loads(metadata_json)
         objects = data.get("objects", [])
         timestamp = data.get("timestamp")
         
         # Log & Embed for Session summary and RAG (Keep existing logic)
         if objects:
+            # Session Tracking
+            self.session_data["objects_seen"].update(obj['label'] for obj in objects)
+            self.session_data["dangerous_events"] += sum(1 for obj in objects if obj['is_dangerous'])
+
             for obj in objects:
                 label = obj['label']
-                # Session Tracking
-                self.session_data["objects_seen"][label] = self.session_data["objects_seen"].get(label, 0) + 1
-                if obj['is_dangerous']:
-                    self.session_data["dangerous_events"] += 1
-                
                 # Persistent Logging (with cooldown)
                 current_time = time.time()
                 if current_time - self.logged_objects.get(label, 0) > 60:
@@ -87,7 +266,21 @@ class LLMService:
                 # Vector Store Embedding (Async) - simplified usage
                 if self.vector_store:
                     desc = f"A {obj['distance']} {label} at {obj['position']}."
-                    threading.Thread(target=self.vector_store.add, args=(desc, {"label": label, "timestamp": timestamp}), daemon=True).start()
+                    try:
+                        self._embed_q.put_nowait((desc, {"label": label, "timestamp": timestamp}))
+                    except queue.Full:
+                        pass  # Drop rather than stall the frame path
+
+        return self._describe_scene(objects, image_data, target_language, user_id, on_text)
+
+    def _describe_scene(self, objects, image_data, target_language, user_id, on_text):
+        """Builds the prompt and asks Gemini, falling back to the heuristic."""
+        # Sentences already handed to on_text; if the stream breaks after some were
+        # spoken, they become the response so the text matches what was heard
+        streamed = []
+        def emit(sentence):
+            streamed.append(sentence)
+            on_text(sentence)
 
         # Construct Prompt
         object_descriptions = []
@@ -102,38 +295,12 @@ class LLMService:
         
         context_str = "\\n".join(object_descriptions) if object_descriptions else "No specific objects detected by basic sensors."
 
-        prompt_prefix = (
-            f"You are an assistive vision assistant for a visually impaired user. "
-            f"I will provide an image of what is in front of the user, and a list of objects detected by sensors.\\n"
-        )
-        
         user_faces = []
         if contains_person and user_id:
-            from src.database import SessionLocal, ReferenceFace
-            db = SessionLocal()
-            try:
-                faces = db.query(ReferenceFace).filter(ReferenceFace.user_id == user_id).all()
-                for face in faces:
-                    if os.path.exists(face.file_path):
-                        try:
-                            img = Image.open(face.file_path)
-                            img.load()
-                            user_faces.append({"name": face.name, "image": img})
-                        except Exception as e:
-                            logging.error(f"Failed to load user face {face.file_path}: {e}")
-            finally:
-                db.close()
+            user_faces = _get_reference_faces(user_id)
                 
-        if contains_person and user_faces:
-            prompt_prefix += "I've also provided reference images of known people. Compare any faces in the main image to these references. If you recognize them, refer to them by name. Explicitly describe their emotion or expressions.\\n"
-
-        prompt_body = (
-            f"Sensor Detections:\\n{context_str}\\n\\n"
-            f"Task: Analyze the main image and the detections. Provide a helpful, safety-focused spoken notification in {target_language}. "
-            f"If there is text in the image, read it if relevant. Describe important details that sensors might miss. "
-            f"Strictly follow this format: 'There is [description]. [Navigational guidance]'. "
-            f"Keep it concise, under 2 sentences. Prioritize immediate safety hazards."
-        )
+        head = _PROMPT_HEAD_WITH_FACES if contains_person and user_faces else _PROMPT_HEAD
+        prompt = head + context_str + _prompt_tail(target_language)
 
         # Call Gemini (Multimodal)
         if self.client:
@@ -144,28 +311,33 @@ class LLMService:
                 if contains_person and user_faces:
                     for kf in user_faces:
                         contents.append(f"Reference Image: {kf['name']}")
-                        contents.append(kf['image'])
+                        contents.append(types.Part.from_bytes(data=kf['data'], mime_type="image/jpeg"))
                 
-                contents.append(prompt_prefix + prompt_body)
+                contents.append(prompt)
+                key_parts = [prompt.encode("utf-8")]
+                for kf in user_faces:
+                    key_parts.append(kf['data'])
                 
                 if image_data is not None:
-                    # Convert numpy array (OpenCV) to PIL Image
                     if isinstance(image_data, np.ndarray):
-                        # OpenCV is BGR, PIL needs RGB
-                        img_rgb = cv2.cvtColor(image_data, cv2.COLOR_BGR2RGB)
-                        pil_img = Image.fromarray(img_rgb)
+                        # OpenCV encodes BGR directly, so no colour conversion or PIL round-trip
+                        # The model only needs ~768px on the long edge; fewer pixels means fewer vision tokens
+                        ok, buf = cv2.imencode('.jpg', _shrink(image_data), [cv2.IMWRITE_JPEG_QUALITY, 85])
+                        if not ok:
+                            raise ValueError("Failed to JPEG-encode frame")
                         contents.append("Main Image:")
-                        contents.append(pil_img)
+                        contents.append(types.Part.from_bytes(data=buf.tobytes(), mime_type="image/jpeg"))
+                        # A strided sample identifies the frame without hashing every pixel
+                        key_parts.append(str(image_data.shape).encode("utf-8"))
+                        key_parts.append(image_data[::16, ::16].tobytes())
                     else:
                         logging.warning("Image data provided but not a numpy array. Skipping image.")
 
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=contents
-                )
-                return response.text
+                return self._generate_cached(contents, key_parts, on_text=emit if on_text else None)
             except Exception as e:
                 logging.error(f"Gemini API Error: {e}")
+                if streamed:
+                    return " ".join(streamed)
                 print(f"⚠️ Gemini API Error (Using Fallback): {e}")
                 return self._fallback_heuristic(objects)
         else:
@@ -191,7 +363,7 @@ class LLMService:
         Returns a session summary string.
         """
         duration = int(time.time() - self.session_data["start_time"])
-        top_objects = sorted(self.session_data["objects_seen"].items(), key=lambda x: x[1], reverse=True)[:5]
+        top_objects = self.session_data["objects_seen"].most_common(5)
         top_str = ", ".join([f"{k} ({v})" for k, v in top_objects])
         
         return (f"Session ended. Duration: {duration} seconds. "
@@ -229,13 +401,14 @@ class LLMService:
         # 3. Call LLM
         if self.client:
             try:
-                response = self.client.models.generate_content(
-                    model=self.model_name,
-                    contents=prompt
-                )
-                return response.text
+                return self._generate_cached(prompt, [prompt.encode("utf-8")])
             except Exception as e:
                 logging.error(f"Gemini Memory Answer Error: {e}")
                 return "I'm sorry, I couldn't process your question right now."
         else:
             return "LLM is not connected."
+
+    async def ask_async(self, question):
+        """ask on the service's thread pool, for use from the event loop."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._pool, self.ask, question)
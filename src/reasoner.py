@@ -1,5 +1,5 @@
 import time
-import json
+import orjson
 import config
 from src.llm_service import LLMService
 
@@ -11,9 +11,10 @@ class SceneReasoner:
         self.cooldown_danger = 3.0  # Repeat dangerous objects more often
         self.last_llm_call = 0.0    # Timestamp of last actual LLM API call
 
-    def process(self, detections, frame=None, user_id=None):
+    def process(self, detections, frame=None, user_id=None, on_text=None):
         """
         Filters detections and sends to LLMService.
+        on_text, if given, receives the response sentence by sentence as it streams in.
         """
         if not detections:
             return None
@@ -74,7 +75,7 @@ class SceneReasoner:
         }
         
         # Call LLM
-        response = self.llm.generate_response(json.dumps(metadata), image_data=frame, user_id=user_id)
+        response = self.llm.generate_response(orjson.dumps(metadata), image_data=frame, user_id=user_id, on_text=on_text)
         if response:
             self.last_llm_call = time.time()
         return response
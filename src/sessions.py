@@ -0,0 +1,89 @@
+import orjson
+import secrets
+import logging
+try:
+    import redis.asyncio as aioredis
+except ImportError:
+    aioredis = None
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+
+class RedisSessionMiddleware:
+    """
+    Server-side sessions kept in Redis.
+    The cookie only carries a random 128-bit session id; the session dict lives
+    under "session:<id>" so every Uvicorn worker sees the same state.
+    Drop-in replacement for starlette's SessionMiddleware (request.session).
+    """
+    def __init__(self, app, redis_url, session_cookie="sid", max_age=86400, same_site="lax", https_only=False):
+        self.app = app
+        self.redis = aioredis.Redis.from_url(redis_url, decode_responses=False)
+        self.session_cookie = session_cookie
+        self.max_age = max_age
+        self.security_flags = f"httponly; samesite={same_site}"
+        if https_only:
+            self.security_flags += "; secure"
+
+    def _key(self, session_id):
+        return f"session:{session_id}"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        connection = HTTPConnection(scope)
+        session_id = connection.cookies.get(self.session_cookie)
+        initial = b""
+        scope["session"] = {}
+        if session_id:
+            try:
+                initial = await self.redis.get(self._key(session_id)) or b""
+                if initial:
+                    scope["session"] = orjson.loads(initial)
+            except Exception as e:
+                logging.error(f"Session load failed: {e}")
+
+        async def send_wrapper(message):
+            nonlocal session_id
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                try:
+                    if scope["session"]:
+                        data = orjson.dumps(scope["session"])
+                        if not initial:
+                            session_id = secrets.token_hex(16)
+                        if data != initial:
+                            await self.redis.set(self._key(session_id), data, ex=self.max_age)
+                        else:
+                            # Unchanged: only slide the expiry, as SessionMiddleware does
+                            await self.redis.expire(self._key(session_id), self.max_age)
+                        headers.append(
+                            "Set-Cookie",
+                            f"{self.session_cookie}={session_id}; path=/; Max-Age={self.max_age}; {self.security_flags}"
+                        )
+                    elif initial:
+                        await self.redis.delete(self._key(session_id))
+                        headers.append(
+                            "Set-Cookie",
+                            f"{self.session_cookie}=null; path=/; expires=Thu, 01 Jan 1970 00:00:00 GMT; {self.security_flags}"
+                        )
+                except Exception as e:
+                    logging.error(f"Session save failed: {e}")
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+def add_session_middleware(app, secret_key, redis_url=None):
+    """
+    Uses Redis-backed sessions when a Redis URL is configured and the client
+    library is installed, otherwise starlette's signed-cookie sessions.
+    """
+    if redis_url and aioredis:
+        app.add_middleware(RedisSessionMiddleware, redis_url=redis_url)
+        logging.info("Using Redis session storage.")
+        return
+    if redis_url:
+        logging.warning("redis library not installed. Falling back to cookie sessions.")
+    from starlette.middleware.sessions import SessionMiddleware
+    app.add_middleware(SessionMiddleware, secret_key=secret_key)
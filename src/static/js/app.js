@@ -16,6 +16,7 @@ document.addEventListener('DOMContentLoaded', () => {
     const modalAnswer = document.getElementById('modal-answer');
     const modalMicBtn = document.getElementById('modal-mic-btn');
     const overlayToggle = document.getElementById('overlay-toggle');
+    const videoFeed = document.getElementById('video-feed');
 
     // Auth & Profile
     const loginOverlay = document.getElementById('login-overlay');
@@ -320,12 +321,10 @@ document.addEventListener('DOMContentLoaded', () => {
 
                 // Load Settings
                 if (user.settings_json) {
-                    try {
-                        const settings = JSON.parse(user.settings_json);
-                        if (overlayToggle) {
-                            overlayToggle.checked = settings.show_overlays;
-                        }
-                    } catch (e) { }
+                    const settings = user.settings_json;
+                    if (overlayToggle) {
+                        overlayToggle.checked = settings.show_overlays;
+                    }
                 }
 
                 // Dashboard processes run automatically (polling, etc.)
@@ -358,6 +357,33 @@ document.addEventListener('DOMContentLoaded', () => {
         });
     }
 
+    // --- Video Feed ---
+    // Frames arrive as binary JPEG messages over a WebSocket. The <img> starts on
+    // the MJPEG stream and goes back to it if the socket can't be used.
+    function startVideoSocket() {
+        if (!videoFeed || !('WebSocket' in window)) return;
+
+        const proto = window.location.protocol === 'https:' ? 'wss' : 'ws';
+        const ws = new WebSocket(`${proto}://${window.location.host}/ws/video`);
+        ws.binaryType = 'arraybuffer';
+        let frameUrl = null;
+
+        ws.onmessage = (event) => {
+            const url = URL.createObjectURL(new Blob([event.data], { type: 'image/jpeg' }));
+            videoFeed.src = url;
+            if (frameUrl) URL.revokeObjectURL(frameUrl);
+            frameUrl = url;
+        };
+
+        ws.onclose = () => {
+            if (frameUrl) {
+                URL.revokeObjectURL(frameUrl);
+                frameUrl = null;
+                videoFeed.src = '/video_feed';
+            }
+        };
+    }
+
     // --- Faces Management ---
     async function loadFaces() {
         try {
@@ -555,6 +581,7 @@ document.addEventListener('DOMContentLoaded', () => {
 
     // Check auth and initialize on load
     checkAuth();
+    startVideoSocket();
 
     // Start polling status
     setInterval(fetchStatus, POLL_INTERVAL);
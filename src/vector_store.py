@@ -40,6 +40,22 @@ class VectorStore:
         except Exception as e:
             logging.error(f"VectorStore add failed: {e}")
 
+    def add_many(self, texts, metadatas):
+        """
+        Adds a batch of text entries in a single collection call.
+        """
+        if not self.ready or not texts:
+            return
+
+        try:
+            self.collection.add(
+                documents=list(texts),
+                metadatas=list(metadatas),
+                ids=[str(uuid.uuid4()) for _ in texts]
+            )
+        except Exception as e:
+            logging.error(f"VectorStore add_many failed: {e}")
+
     def query(self, query_text, n_results=3):
         """
         Returns similar past events.
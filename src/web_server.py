@@ -1,26 +1,35 @@
+import os
+import config
+# Cap the native thread pools before numpy/cv2 load them so they don't fight YOLO for cores
+os.environ.setdefault("OMP_NUM_THREADS", str(config.BLAS_THREADS))
+os.environ.setdefault("MKL_NUM_THREADS", str(config.BLAS_THREADS))
 import cv2
+cv2.setNumThreads(config.OPENCV_THREADS)
+import numpy as np
 import time
 import logging
 import threading
 import asyncio
-import json
-from fastapi import FastAPI, Request, HTTPException, Depends, File, UploadFile, Form
-from fastapi.responses import StreamingResponse, JSONResponse, RedirectResponse
+import orjson
+from fastapi import FastAPI, Request, HTTPException, Depends, File, UploadFile, Form, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse, RedirectResponse, Response
 from fastapi.staticfiles import StaticFiles
+from fastapi.concurrency import run_in_threadpool
 from fastapi.templating import Jinja2Templates
 from pydantic import BaseModel
-from queue import Queue
-from starlette.middleware.sessions import SessionMiddleware
-import os
-import shutil
+from queue import Queue, Empty, Full
+from collections import OrderedDict
+import aiofiles
 
-import config
 from src.camera import CameraFeed
 from src.detector import ObjectDetector
 from src.reasoner import SceneReasoner
+from src.llm_service import evict_reference_faces, encode_reference_face, reference_jpeg_path
 from src.audio import AudioFeedback
-from src.database import init_db, get_db, User, ReferenceFace
-from src.auth import auth_router
+from src.data_logger import recent_events, seed_recent_events, RECENT_MAX
+from src.database import init_db, get_db_read, get_db_write, User, ReferenceFace
+from src.auth import auth_router, invalidate_user_profile, require_user
+from src.sessions import add_session_middleware
 from sqlalchemy.orm import Session
 
 # Configure logging
@@ -30,7 +39,7 @@ logging.basicConfig(filename='system.log', level=logging.INFO,
 init_db()
 
 app = FastAPI()
-app.add_middleware(SessionMiddleware, secret_key=config.SECRET_KEY)
+add_session_middleware(app, config.SECRET_KEY, redis_url=config.REDIS_URL)
 app.include_router(auth_router)
 
 # Mount static files
@@ -38,6 +47,8 @@ app.mount("/static", StaticFiles(directory="src/static"), name="static")
 
 # Templates
 templates = Jinja2Templates(directory="src/templates")
+# index.html doesn't depend on the request, so it is rendered once and reused
+_index_html = None
 
 # Global State
 camera = None
@@ -45,7 +56,6 @@ detector = None
 reasoner = None
 audio = None
 current_detections = []
-latest_frame = None
 latest_llm_response = "Welcome. System is listening."  # Store the latest LLM text
 system_status = "Inactive"
 current_fps = 0
@@ -53,6 +63,182 @@ lock = threading.Lock()
 active_user_id = None # Tracks the physically active user for background detection
 system_active = False # Tracks if the camera and detection loop are running
 show_overlays = True  # Controls bounding box rendering in video_feed
+camera_idle = threading.Event() # Set while the detection loop is not touching the camera
+state_lock = asyncio.Lock() # Serializes /api/system/state transitions
+
+# Triple buffer for the latest camera frame. The detection loop copies each frame
+# into a slot that is neither published nor claimed by the inference thread, then
+# publishes it by storing the slot index. Frame data is never copied under a lock;
+# _slot_lock only covers the index bookkeeping so a claim can't race a slot choice.
+frame_slots = []
+published_idx = -1
+consumed_idx = -1
+_slot_lock = threading.Lock()
+
+def publish_frame(frame):
+    """Copies frame into a free slot, publishes it and returns its index."""
+    global frame_slots, published_idx
+    with _slot_lock:
+        if not frame_slots or frame_slots[0].shape != frame.shape:
+            published_idx = -1
+            frame_slots = [np.empty_like(frame) for _ in range(3)]
+        write_idx = next(i for i in range(3) if i != published_idx and i != consumed_idx)
+    np.copyto(frame_slots[write_idx], frame)
+    published_idx = write_idx
+    return write_idx
+
+def claim_frame(idx):
+    """
+    Claims a published slot so the detection loop won't overwrite it and returns
+    it (treat as read-only). Falls forward to the newest slot if idx is stale.
+    """
+    global consumed_idx
+    with _slot_lock:
+        if idx != published_idx:
+            idx = published_idx
+        if idx < 0:
+            return None
+        consumed_idx = idx
+        return frame_slots[idx]
+
+# Single-slot mailboxes. Posting replaces any item still waiting, so each
+# consumer always sees the newest one:
+# inference_in carries published slot indices for the inference thread,
+# reasoner_in carries (detections, frame copy) for the reasoner thread.
+inference_in = Queue(maxsize=1)
+reasoner_in = Queue(maxsize=1)
+
+def post_latest(mailbox, item):
+    try:
+        mailbox.get_nowait()
+    except Empty:
+        pass
+    try:
+        mailbox.put_nowait(item)
+    except Full:
+        pass
+
+def submit_for_inference(idx):
+    post_latest(inference_in, idx)
+
+# Each frame is JPEG-encoded and wrapped in its multipart chunk once by the
+# detection loop; every /video_feed viewer yields the same bytes object.
+# Replaced (never mutated) so readers need no lock.
+_MULTIPART_HEADER = b'--frame\r\nContent-Type: image/jpeg\r\n\r\n'
+_MULTIPART_TRAILER = b'\r\n'
+_JPEG_START = len(_MULTIPART_HEADER)
+latest_chunk = None
+
+def _placeholder_jpeg(text, origin, color):
+    placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
+    cv2.putText(placeholder, text, origin, cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2)
+    _, buffer = cv2.imencode('.jpg', placeholder)
+    return buffer.tobytes()
+
+# Complete multipart chunks for when the system is inactive / has no camera feed
+_PLACEHOLDER_CHUNK = _MULTIPART_HEADER + _placeholder_jpeg("System Inactive", (200, 240), (255, 255, 255)) + _MULTIPART_TRAILER
+_ERROR_CHUNK = _MULTIPART_HEADER + _placeholder_jpeg("Camera Error / No Feed", (140, 240), (0, 0, 255)) + _MULTIPART_TRAILER
+
+# Stream handlers wait on frame_ready instead of polling. The event is set and
+# replaced with a fresh one for every frame, so all viewers wake, not just one.
+main_loop = None
+frame_ready = None
+
+def _signal_frame_ready():
+    global frame_ready
+    frame_ready.set()
+    frame_ready = asyncio.Event()
+
+def notify_frame_ready():
+    """Wakes waiting /video_feed streams; safe to call from any thread."""
+    if main_loop is not None:
+        main_loop.call_soon_threadsafe(_signal_frame_ready)
+
+# Overlay for the latest detections, precomputed once per detection pass:
+# (int boxes, BGR colours, label strings). Replaced, never mutated.
+_DANGER_COLOR = (0, 0, 255)
+_SAFE_COLOR = (0, 255, 0)
+current_overlay = None
+
+def build_overlay(detections):
+    """Converts detections into the drawing data render_stream_frame needs."""
+    if not detections:
+        return None
+    boxes = np.asarray([d['box'] for d in detections], dtype=np.int32)
+    dangerous = np.asarray([bool(d.get('is_dangerous')) for d in detections])
+    colors = np.where(dangerous[:, None], _DANGER_COLOR, _SAFE_COLOR)
+    labels = [f"{d['label']} {d['confidence']:.2f}" for d in detections]
+    return boxes.tolist(), [tuple(c) for c in colors.tolist()], labels
+
+# Pre-rendered label coverage masks keyed by text. Labels carry the confidence
+# at 2 decimals, so the same few strings repeat across frames. Each entry holds
+# the glyph coverage (0..1) cropped to its ink, so blending it in the label
+# colour gives the same pixels putText would draw. Only the detection loop
+# draws, so no lock is needed.
+_LABEL_CHIP_MAX = 256
+_label_chips = OrderedDict()
+
+def _label_chip(text):
+    """Returns (alpha, 1 - alpha, dx, dy) for a label, rendering it only on first use."""
+    entry = _label_chips.get(text)
+    if entry is not None:
+        _label_chips.move_to_end(text)
+        return entry
+    (w, h), baseline = cv2.getTextSize(text, cv2.LINE_AA, 0.5, 2)
+    pad = h + 2 # Generous room for the stroke width and the italic slant; cropped below
+    canvas = np.zeros((h + baseline + 2 * pad, w + 2 * pad), dtype=np.uint8)
+    org = (pad, pad + h)
+    cv2.putText(canvas, text, org, cv2.LINE_AA, 0.5, 255, 2)
+    ys, xs = np.nonzero(canvas)
+    if len(ys) == 0:
+        entry = None
+    else:
+        y0, y1, x0, x1 = ys.min(), ys.max() + 1, xs.min(), xs.max() + 1
+        alpha = canvas[y0:y1, x0:x1, None].astype(np.float32) / 255
+        # (dx, dy) place the crop relative to the putText origin
+        entry = (alpha, 1 - alpha, int(x0) - org[0], int(y0) - org[1])
+    _label_chips[text] = entry
+    if len(_label_chips) > _LABEL_CHIP_MAX:
+        _label_chips.popitem(last=False)
+    return entry
+
+def _draw_label(dst, text, origin, color):
+    """Blends a cached label into dst as putText(text, origin) would, clipped to dst."""
+    entry = _label_chip(text)
+    if entry is None:
+        return
+    alpha, inv_alpha, dx, dy = entry
+    x, y = origin[0] + dx, origin[1] + dy
+    h, w = alpha.shape[:2]
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + w, dst.shape[1]), min(y + h, dst.shape[0])
+    if x0 >= x1 or y0 >= y1:
+        return
+    region = dst[y0:y1, x0:x1]
+    a = alpha[y0 - y:y1 - y, x0 - x:x1 - x]
+    blended = region * inv_alpha[y0 - y:y1 - y, x0 - x:x1 - x] + np.asarray(color, dtype=np.float32) * a
+    np.copyto(region, blended + 0.5, casting="unsafe")
+
+def render_stream_frame(frame, scratch):
+    """Draws detection overlays onto a copy of frame and encodes it as a multipart JPEG chunk."""
+    image = frame
+    
+    # Draw detections; frame itself is shared, so only copy when there is something to draw
+    overlay = current_overlay
+    if show_overlays and overlay:
+        if scratch is None or scratch.shape != frame.shape:
+            scratch = np.empty_like(frame)
+        np.copyto(scratch, frame)
+        image = scratch
+        for (x1, y1, x2, y2), color, label in zip(*overlay):
+            cv2.rectangle(scratch, (x1, y1), (x2, y2), color, 2)
+            _draw_label(scratch, label, (x1, y1 - 10), color)
+
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 80, cv2.IMWRITE_JPEG_OPTIMIZE, 0])
+    if not ok:
+        return scratch, None
+    # join reads the encoder's buffer in place, so the JPEG is copied exactly once
+    return scratch, b"".join((_MULTIPART_HEADER, buffer, _MULTIPART_TRAILER))
 
 def get_camera():
     global camera
@@ -65,7 +251,9 @@ def get_detector():
     if detector is None:
         try:
             print("Loading Object Detector...")
-            detector = ObjectDetector()
+            det = ObjectDetector(precision=config.DETECTOR_PRECISION)
+            det.warmup()
+            detector = det
             print("Object Detector Loaded.")
         except Exception as e:
             logging.error(f"Failed to load detector: {e}")
@@ -84,44 +272,63 @@ def get_audio():
         audio = AudioFeedback()
     return audio
 
-def get_recent_logs(n=20):
-    """Reads the last n lines from detections.jsonl and formats them."""
-    log_file = "detections.jsonl"
-    logs = []
+def _read_tail_lines(path, n, block_size=4096):
+    """Returns the last n lines of a file, reading backwards in blocks from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        pos = f.tell()
+        buf = b""
+        # One extra newline guarantees the first line we keep is complete
+        while pos > 0 and buf.count(b"\n") <= n:
+            step = min(block_size, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    return buf.splitlines()[-n:]
+
+def _format_log_event(data):
+    timestamp = data.get("timestamp", "").split("T")[-1].split(".")[0] # Extract HH:MM:SS
+    label = data.get("label", "unknown")
+    conf = data.get("metadata", {}).get("confidence", 0)
+    return f"[{timestamp}] Detected {label} ({conf:.2f})"
+
+def seed_log_tail(log_file="detections.jsonl"):
+    """Loads the end of the log file into the in-memory tail so history carries across restarts."""
     try:
-        with open(log_file, "r") as f:
-            # Efficiently read last n lines (for small files readlines is fine, 
-            # for huge files we'd use seek, but this is simple enough for now)
-            lines = f.readlines()
-            last_n = lines[-n:]
-            
-            for line in last_n:
-                try:
-                    data = json.loads(line)
-                    timestamp = data.get("timestamp", "").split("T")[-1].split(".")[0] # Extract HH:MM:SS
-                    label = data.get("label", "unknown")
-                    conf = data.get("metadata", {}).get("confidence", 0)
-                    logs.append(f"[{timestamp}] Detected {label} ({conf:.2f})")
-                except json.JSONDecodeError:
-                    continue
+        lines = _read_tail_lines(log_file, RECENT_MAX)
     except FileNotFoundError:
-        logs.append("Log file not found.")
+        return
+    events = []
+    for line in lines:
+        try:
+            events.append(orjson.loads(line))
+        except ValueError:
+            continue
+    seed_recent_events(events)
+
+def get_recent_logs(n=20):
+    """Formats the last n detection events from the in-memory tail."""
+    try:
+        return [_format_log_event(data) for data in recent_events(n)]
     except Exception as e:
-        logs.append(f"Error reading logs: {e}")
-    # print(f"DEBUG LOGS: {len(logs)} entries found")
-    return logs
+        return [f"Error reading logs: {e}"]
 
 # Background Task for Detection
 def detection_loop():
-    global current_detections, system_status, latest_frame, latest_llm_response, current_fps, system_active
+    """Grabs camera frames, publishes them for streaming and hands them to inference."""
+    global system_status, current_fps, system_active, latest_chunk
     
-    frame_count = 0
+    stream_scratch = None
     print("Starting Detection Loop thread...")
     last_loop_time = time.time()
     
     while True:
         try:
+            # Clear before checking, so a stop that lands after the check never sees
+            # a stale "idle" left over from the previous inactive period
+            camera_idle.clear()
             if not system_active:
+                camera_idle.set()
                 time.sleep(0.5)
                 last_loop_time = time.time()
                 continue
@@ -129,35 +336,25 @@ def detection_loop():
             system_status = "Running"
             
             cam = get_camera()
-            det = get_detector()
-            res = get_reasoner()
-            aud = get_audio()
             
-            frame = cam.read()
+            # Wake once per grabbed frame instead of polling the camera
+            if not cam.frame_available.wait(timeout=0.1):
+                continue
+            cam.frame_available.clear()
+            # Copied once, straight from the camera's buffer into a free slot
+            frame = cam.latest()
             if frame is None:
-                time.sleep(0.1)
                 continue
             
             # Update latest frame for streaming
-            with lock:
-                latest_frame = frame.copy()
-
-            if frame_count % config.DETECTION_INTERVAL == 0:
-                if det:
-                    detections = det.detect(frame)
-                    current_detections = detections
-                    
-                    if res:
-                        res_text = res.process(detections, frame=frame, user_id=active_user_id)
-                        if res_text:
-                            with lock:
-                                latest_llm_response = res_text
-                                
-                            # Also speak it
-                            if aud:
-                                aud.speak(res_text)
-            
-            frame_count += 1
+            idx = publish_frame(frame)
+            stream_scratch, chunk = render_stream_frame(frame, stream_scratch)
+            if chunk is not None:
+                latest_chunk = chunk
+                notify_frame_ready()
+
+            # Never waits on the model: a busy inference thread just gets a newer frame
+            submit_for_inference(idx)
             
             # FPS Calculation
             current_time = time.time()
@@ -166,17 +363,94 @@ def detection_loop():
                 fps = 1.0 / elapsed
                 current_fps = 0.9 * current_fps + 0.1 * fps # Smoothing
             last_loop_time = current_time
-
-            time.sleep(0.01) # Small sleep to prevent tight loop
             
         except Exception as e:
             logging.error(f"Error in detection loop: {e}")
             time.sleep(1)
 
+def inference_loop():
+    """Runs the detector on the newest frame from the mailbox and publishes the results."""
+    global current_detections, current_overlay
+    
+    print("Starting Inference thread...")
+    while True:
+        idx = inference_in.get()
+        try:
+            det = get_detector()
+            if not det:
+                continue
+
+            # The claimed slot stays untouched until the next claim
+            frame = claim_frame(idx)
+            if frame is None:
+                continue
+
+            detections = det.detect(frame)
+            current_detections = detections
+            current_overlay = build_overlay(detections)
+
+            # The reasoner may still be waiting on Gemini; hand it a copy of the
+            # frame since this slot is recycled on the next claim
+            if detections:
+                post_latest(reasoner_in, (detections, frame.copy()))
+        except Exception as e:
+            logging.error(f"Error in inference loop: {e}")
+            time.sleep(1)
+
+def reasoner_loop():
+    """Turns the newest detections into guidance without holding up detection."""
+    global latest_llm_response
+    
+    print("Starting Reasoner thread...")
+    while True:
+        detections, frame = reasoner_in.get()
+        try:
+            res = get_reasoner()
+            aud = get_audio()
+            if not res:
+                continue
+
+            # Speak each sentence as soon as Gemini streams it. Only the first
+            # sentence is subject to the backlog limit; once it is queued the rest
+            # of the response always follows, so no sentence is lost mid-answer.
+            spoken = []
+            queued = False
+            def speak_sentence(text):
+                nonlocal queued
+                spoken.append(text)
+                if len(spoken) == 1:
+                    queued = aud.speak(text)
+                elif queued:
+                    aud.speak(text, force=True)
+
+            res_text = res.process(detections, frame=frame, user_id=active_user_id,
+                                   on_text=speak_sentence if aud else None)
+            if res_text:
+                with lock:
+                    latest_llm_response = res_text
+                    
+                # Also speak it (fallback responses are not streamed)
+                if aud and not spoken:
+                    aud.speak(res_text)
+        except Exception as e:
+            logging.error(f"Error in reasoner loop: {e}")
+            time.sleep(1)
+
 # Start detection in background
 @app.on_event("startup")
 async def startup_event():
+    global main_loop, frame_ready
+    main_loop = asyncio.get_running_loop()
+    frame_ready = asyncio.Event()
+    try:
+        await run_in_threadpool(seed_log_tail)
+    except Exception as e:
+        logging.error(f"Failed to load recent logs: {e}")
+    # Load and warm the model before the loops start so the first frames don't stall on it
+    await run_in_threadpool(get_detector)
     threading.Thread(target=detection_loop, daemon=True).start()
+    threading.Thread(target=inference_loop, daemon=True).start()
+    threading.Thread(target=reasoner_loop, daemon=True).start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
@@ -187,121 +461,129 @@ async def shutdown_event():
 @app.get("/")
 async def index(request: Request):
     if not request.session.get('user_id'):
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/login", status_code=303)
-    return templates.TemplateResponse("index.html", {"request": request})
+    global _index_html
+    if _index_html is None:
+        _index_html = templates.get_template("index.html").render(request=request).encode("utf-8")
+    return Response(_index_html, media_type="text/html")
 
-def generate_frames():
-    global latest_frame, current_detections, show_overlays, system_active
+async def generate_frames():
+    global system_active
     
-    import numpy as np
-    
-    # Pre-generate a black placeholder image with text for when inactive
-    placeholder = np.zeros((480, 640, 3), dtype=np.uint8)
-    cv2.putText(placeholder, "System Inactive", (200, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-    _, placeholder_buffer = cv2.imencode('.jpg', placeholder)
-    placeholder_bytes = placeholder_buffer.tobytes()
-    # Pre-generate a black placeholder image for camera error
-    placeholder_err = np.zeros((480, 640, 3), dtype=np.uint8)
-    cv2.putText(placeholder_err, "Camera Error / No Feed", (140, 240), cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 0, 255), 2)
-    _, err_buffer = cv2.imencode('.jpg', placeholder_err)
-    err_bytes = err_buffer.tobytes()
+    last_sent = None
     
     while True:
         if not system_active:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + placeholder_bytes + b'\r\n')
-            time.sleep(1) # Send placeholder slowly
+            yield _PLACEHOLDER_CHUNK
+            await asyncio.sleep(1) # Send placeholder slowly
             continue
 
-        with lock:
-            frame_to_send = latest_frame.copy() if latest_frame is not None else None
+        # Grab the event before the frame so a publish in between still wakes us
+        ready = frame_ready
+        chunk = latest_chunk
 
-        if frame_to_send is None:
-            yield (b'--frame\r\n'
-                   b'Content-Type: image/jpeg\r\n\r\n' + err_bytes + b'\r\n')
-            time.sleep(1) # Send error placeholder slowly
+        if chunk is None:
+            yield _ERROR_CHUNK
+            await asyncio.sleep(1) # Send error placeholder slowly
             continue
-            
-        frame = frame_to_send
-        
-        # Draw detections
-        if show_overlays:
-            for d in current_detections:
-                box = d['box']
-                label = f"{d['label']} {d['confidence']:.2f}"
-                color = (0, 0, 255) if d.get('is_dangerous') else (0, 255, 0)
-                cv2.rectangle(frame, (int(box[0]), int(box[1])), (int(box[2]), int(box[3])), color, 2)
-                cv2.putText(frame, label, (int(box[0]), int(box[1]) - 10), cv2.LINE_AA, 0.5, color, 2)
-            
-        ret, buffer = cv2.imencode('.jpg', frame)
-        frame_bytes = buffer.tobytes()
-        
-        yield (b'--frame\r\n'
-               b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+
+        # Only send frames the detection loop has not already given us
+        if chunk is not last_sent:
+            yield chunk
+            last_sent = chunk
         
-        time.sleep(0.03) # ~30 FPS
+        try:
+            await asyncio.wait_for(ready.wait(), timeout=1)
+        except asyncio.TimeoutError:
+            pass # Re-check system state
 
 @app.get("/video_feed")
 async def video_feed():
     return StreamingResponse(generate_frames(), media_type="multipart/x-mixed-replace; boundary=frame")
 
+async def _until_disconnect(websocket: WebSocket):
+    # The client never sends anything, so this only returns once it goes away
+    while (await websocket.receive())["type"] != "websocket.disconnect":
+        pass
+
+@app.websocket("/ws/video")
+async def video_ws(websocket: WebSocket):
+    """Sends each new JPEG frame as one binary message; slow clients just skip frames."""
+    await websocket.accept()
+    disconnected = asyncio.create_task(_until_disconnect(websocket))
+    last_sent = None
+    try:
+        while not disconnected.done():
+            # Grab the event before the frame so a publish in between still wakes us
+            ready = frame_ready
+            chunk = latest_chunk if system_active else _PLACEHOLDER_CHUNK
+            if chunk is None:
+                chunk = _ERROR_CHUNK
+
+            if chunk is not last_sent:
+                # Strip the multipart framing; ASGI wants bytes, so the slice is copied
+                await websocket.send_bytes(chunk[_JPEG_START:-len(_MULTIPART_TRAILER)])
+                last_sent = chunk
+
+            # Wake on a new frame, a disconnect, or after 1s to re-check system state
+            waiter = asyncio.ensure_future(ready.wait())
+            await asyncio.wait((waiter, disconnected), timeout=1, return_when=asyncio.FIRST_COMPLETED)
+            waiter.cancel()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        disconnected.cancel()
+
 class SystemStateRequest(BaseModel):
     active: bool
 
 @app.post("/api/system/state")
-async def set_system_state(req: SystemStateRequest, request: Request):
-    global system_active, camera, audio, system_status
-    user_id = request.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
+async def set_system_state(req: SystemStateRequest, user_id: int = Depends(require_user)):
+    global system_active, system_status, active_user_id
     
-    system_active = req.active
-    
-    if req.active:
-        system_status = "Starting..."
-    else:
-        system_status = "Inactive"
-        # Release the hardware components to save power when inactive
-        with lock:
-            if camera:
-                camera.stop()
-                camera = None
+    async with state_lock:
+        system_active = req.active
+        
+        if req.active:
+            # Whoever switches the system on is the user in front of the camera
+            active_user_id = user_id
+            system_status = "Starting..."
+        else:
+            system_status = "Inactive"
+            # Release the hardware components to save power when inactive
+            await run_in_threadpool(_stop_camera)
     
     return {"status": "success", "active": system_active}
 
+def _stop_camera(timeout=2.0):
+    """Waits for the detection loop to step away from the camera, then releases it."""
+    global camera
+    if not camera_idle.wait(timeout):
+        logging.warning("Detection loop still busy; releasing camera anyway.")
+    with lock:
+        if camera:
+            camera.stop()
+            camera = None
+
+# Serialized /api/status body, rebuilt at most every STATUS_TTL seconds so bursts
+# of polls (several tabs, fast clients) share one payload build
+STATUS_TTL = 0.2
+_status_cache = {"ts": 0.0, "body": None}
+
 @app.get("/api/status")
 async def get_status():
-    return JSONResponse({
-        "status": system_status,
-        "detections": current_detections,
-        "fps": int(current_fps) if system_active else 0,
-        "llm_response": latest_llm_response,
-        "logs": get_recent_logs(),
-        "system_active": system_active
-    })
-
-@app.get("/api/user/me")
-async def get_current_user_info(request: Request, db: Session = Depends(get_db)):
-    global active_user_id
-    user_id = request.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
-        
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-        
-    # Set this as the active user for the physical system's background thread
-    active_user_id = user.id
-        
-    return {
-        "id": user.id,
-        "name": user.name,
-        "email": user.email,
-        "avatar_url": user.avatar_url,
-        "settings_json": user.settings_json
-    }
+    now = time.monotonic()
+    if _status_cache["body"] is None or now - _status_cache["ts"] >= STATUS_TTL:
+        _status_cache["body"] = orjson.dumps({
+            "status": system_status,
+            "detections": current_detections,
+            "fps": int(current_fps) if system_active else 0,
+            "llm_response": latest_llm_response,
+            "logs": get_recent_logs(),
+            "system_active": system_active
+        }, option=orjson.OPT_SERIALIZE_NUMPY)
+        _status_cache["ts"] = now
+    return Response(_status_cache["body"], media_type="application/json")
 
 class QuestionRequest(BaseModel):
     question: str
@@ -309,7 +591,7 @@ class QuestionRequest(BaseModel):
 @app.post("/api/ask")
 async def ask_question(request: QuestionRequest):
     res = get_reasoner()
-    answer = res.llm.ask(request.question)
+    answer = await res.llm.ask_async(request.question)
     return {"answer": answer}
 
 class AudioStateRequest(BaseModel):
@@ -329,63 +611,65 @@ class OverlayRequest(BaseModel):
     show: bool
 
 @app.post("/api/settings/overlays")
-async def toggle_overlays(request: OverlayRequest, req: Request, db: Session = Depends(get_db)):
+def toggle_overlays(request: OverlayRequest, user_id: int = Depends(require_user), db: Session = Depends(get_db_write)):
     global show_overlays
     show_overlays = request.show
-    user_id = req.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
     user = db.query(User).filter(User.id == user_id).first()
     if user:
-        settings = json.loads(user.settings_json) if user.settings_json else {}
+        # Assign a new dict so SQLAlchemy sees the change
+        settings = dict(user.settings_json or {})
         settings['show_overlays'] = request.show
-        user.settings_json = json.dumps(settings)
+        user.settings_json = settings
         db.commit()
+        invalidate_user_profile(user.id)
     return {"status": "success", "show_overlays": request.show}
 
 @app.get("/api/faces")
-async def get_my_faces(req: Request, db: Session = Depends(get_db)):
-    user_id = req.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
+def get_my_faces(user_id: int = Depends(require_user), db: Session = Depends(get_db_read)):
     faces = db.query(ReferenceFace).filter(ReferenceFace.user_id == user_id).all()
     return [{"id": f.id, "name": f.name} for f in faces]
 
 @app.post("/api/faces")
-async def upload_face(req: Request, name: str = Form(...), file: UploadFile = File(...), db: Session = Depends(get_db)):
-    user_id = req.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
-    
+async def upload_face(name: str = Form(...), file: UploadFile = File(...), user_id: int = Depends(require_user), db: Session = Depends(get_db_write)):
     # Save file
     safe_name = name.replace(" ", "_").lower()
     filename = f"{user_id}_{safe_name}_{file.filename}"
     filepath = os.path.join("src/faces", filename)
-    with open(filepath, "wb") as buffer:
-        shutil.copyfileobj(file.file, buffer)
+    async with aiofiles.open(filepath, "wb") as buffer:
+        while chunk := await file.read(1 << 20):
+            await buffer.write(chunk)
+    # Pre-encode the copy sent to Gemini so the LLM path never decodes the original
+    try:
+        await run_in_threadpool(encode_reference_face, filepath)
+    except Exception as e:
+        logging.error(f"Failed to pre-encode face {filepath}: {e}")
         
-    # Add to DB
-    face = ReferenceFace(user_id=user_id, name=name, file_path=filepath)
-    db.add(face)
-    db.commit()
+    # Add to DB (sync session, so off the event loop)
+    def add_face():
+        face = ReferenceFace(user_id=user_id, name=name, file_path=filepath)
+        db.add(face)
+        db.commit()
+        return {"status": "success", "id": face.id, "name": face.name}
+
+    result = await run_in_threadpool(add_face)
+    evict_reference_faces(user_id)
     
-    return {"status": "success", "id": face.id, "name": face.name}
+    return result
 
 @app.delete("/api/faces/{face_id}")
-async def delete_face(face_id: int, req: Request, db: Session = Depends(get_db)):
-    user_id = req.session.get('user_id')
-    if not user_id:
-        raise HTTPException(status_code=401, detail="Not logged in")
-    
+def delete_face(face_id: int, user_id: int = Depends(require_user), db: Session = Depends(get_db_write)):
     face = db.query(ReferenceFace).filter(ReferenceFace.id == face_id, ReferenceFace.user_id == user_id).first()
     if not face:
         raise HTTPException(status_code=404, detail="Face not found")
         
     if os.path.exists(face.file_path):
         os.remove(face.file_path)
+    if os.path.exists(reference_jpeg_path(face.file_path)):
+        os.remove(reference_jpeg_path(face.file_path))
         
     db.delete(face)
     db.commit()
+    evict_reference_faces(user_id)
     return {"status": "success"}
 
 